@@ -3,15 +3,16 @@
 #
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
+import hashlib
 import logging
 
 import math
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 import ca_code.nn.layers as la
 
 import ca_code.utils.sh as sh
-import cv2
 import numpy as np
 import torch as th
 import torch.nn as nn
@@ -28,15 +29,13 @@ from ca_code.utils.geom import (
     GeometryModule,
 )
 
-from ca_code.utils.image import (
-    linear2srgb,
-    make_image_grid_batched,
-    scale_diff_image,
-)
+from ca_code.utils.image import linear2srgb, scale_diff_image
 
 from ca_code.utils.mipmap_sampler import mipmap_grid_sample
 
-from ca_code.utils.render_gsplat import render as render_gs
+from ca_code.utils.render_gsplat import render_batched as render_gs_batched
+
+from ca_code.utils.torchutils import CUDAGraphed
 
 from extensions.sgutils.sgutils import evaluate_gaussian
 
@@ -46,6 +45,35 @@ logger = logging.getLogger(__name__)
 
 primscale_range: Tuple[float, float] = (0.1, 20.0)
 
+# max number of light configurations for which the SH basis is kept around
+sh_cache_size: int = 32
+# max number of frames for which the encoder outputs are kept around
+emb_cache_size: int = 64
+
+
+@th.jit.script
+def to_head_relative(
+    head_pose: th.Tensor, Rt: th.Tensor, campos: th.Tensor, light_pos: th.Tensor
+) -> Tuple[th.Tensor, th.Tensor, th.Tensor, th.Tensor]:
+    """Transforms the camera and the lights into the frame of `head_pose` `[B, 3, 4]`.
+
+    Returns the camera extrinsics, the camera position, the light positions and the
+    (normalized) light directions.
+    NOTE: scripted, s.t. the tiny ops get fused instead of each paying a launch.
+    """
+    R = head_pose[:, :3, :3]
+    t = head_pose[:, :3, 3]
+    # same as `Rt @ [[R, t], [0, 1]]`, w/o materializing the 4x4 head pose
+    headrel_Rt = th.cat(
+        [Rt[:, :, :3] @ R, Rt[:, :, :3] @ t.unsqueeze(-1) + Rt[:, :, 3:]], dim=-1
+    )
+    headrel_campos = ((campos - t).unsqueeze(1) @ R)[:, 0]
+    headrel_light_pos = (light_pos - t.unsqueeze(1)) @ R
+    headrel_light_dir = headrel_light_pos / headrel_light_pos.norm(
+        p=2.0, dim=-1, keepdim=True
+    ).clamp(min=1e-12)
+    return headrel_Rt, headrel_campos, headrel_light_pos, headrel_light_dir
+
 
 class AutoEncoder(nn.Module):
     def __init__(
@@ -60,6 +88,8 @@ class AutoEncoder(nn.Module):
         n_diff_sh: int = 8,
         learn_blur: bool = True,
         bg_weight: float = 1.0,
+        compile_mode: Optional[str] = None,
+        inference_precision: Optional[th.dtype] = None,
     ):
         super().__init__()
 
@@ -68,6 +98,11 @@ class AutoEncoder(nn.Module):
         self.n_diff_sh = n_diff_sh
         self.bg_weight = bg_weight
 
+        # SH basis of the head-relative light directions, only used in eval mode
+        self._sh_cache: OrderedDict = OrderedDict()
+        # encoder outputs per frame, only used in eval mode
+        self._emb_cache: OrderedDict = OrderedDict()
+
         self.geo_fn = GeometryModule(
             assets.topology.vi,
             assets.topology.vt,
@@ -109,44 +144,125 @@ class AutoEncoder(nn.Module):
             self.cal_enabled = True
             self.cal = CalV5(**cal, cameras=assets.camera_ids)
 
-    def render(self, K: th.Tensor, Rt: th.Tensor, preds: Dict[str, Any]):
-        B = K.shape[0]
+        # NOTE: albedo is static at test time, storing it in reduced precision halves
+        # the memory traffic of the diffuse color. Not meant for training.
+        if inference_precision is not None:
+            self.decoder.albedo.data = self.decoder.albedo.data.to(inference_precision)
+
+        # NOTE: meant for inference, where shapes are fixed. Only `forward` is replaced,
+        # so that the state dict keys stay the same and checkpoints load as usual.
+        if compile_mode is not None:
+            for module in [self.encoder, self.geomdecoder, self.decoder]:
+                module.forward = th.compile(
+                    module.forward, mode=compile_mode, fullgraph=False, dynamic=False
+                )
+
+    def enable_cuda_graphs(self) -> None:
+        """Replays the fixed-shape networks from captured CUDA graphs, for inference.
+
+        One graph is captured per input shape, e.g. `encode` runs the encoder on the
+        frames missing from its cache, i.e. on 1 to B samples. Shapes beyond the
+        first few fall back to eager execution.
+        """
+        for module in [
+            self.encoder,
+            self.geomdecoder,
+            self.decoder.vnocond_mod,
+            self.decoder.vcond_mod,
+        ]:
+            module.forward = CUDAGraphed(module.forward)
+
+    def train(self, mode: bool = True):
+        # NOTE: weights might change, cached encoder outputs would get stale
+        self._emb_cache.clear()
+        return super().train(mode)
+
+    def encode(
+        self,
+        registration_vertices: th.Tensor,
+        color: th.Tensor,
+        frame_id: Optional[th.Tensor] = None,
+    ) -> Dict[str, th.Tensor]:
+        """Runs the encoder, reusing the outputs of already seen frames in eval mode.
+
+        The encoder inputs only depend on the frame, so all the cameras of a frame
+        share the same embeddings.
+        """
+        if self.training or frame_id is None:
+            return self.encoder(registration_vertices, color)
+
+        keys = frame_id.tolist() if isinstance(frame_id, th.Tensor) else list(frame_id)
+
+        misses = {}
+        for b, key in enumerate(keys):
+            if key not in self._emb_cache:
+                misses.setdefault(key, b)
+        if misses:
+            idxs = th.as_tensor(list(misses.values()), device=color.device)
+            enc_preds = self.encoder(registration_vertices[idxs], color[idxs])
+            for i, key in enumerate(misses):
+                # NOTE: cloning, since the outputs can be static CUDA graph buffers
+                self._emb_cache[key] = {
+                    k: v[i : i + 1].clone() for k, v in enc_preds.items()
+                }
+
+        entries = []
+        for key in keys:
+            self._emb_cache.move_to_end(key)
+            entries.append(self._emb_cache[key])
+        while len(self._emb_cache) > emb_cache_size:
+            self._emb_cache.popitem(last=False)
+
+        return {k: th.cat([e[k] for e in entries]) for k in entries[0]}
+
+    def light_dir2sh(self, light_dir: th.Tensor) -> th.Tensor:
+        """Computes the SH basis for light directions `[B, n_lights, 3]`.
+
+        In eval mode, lights and head poses are typically static across frames,
+        so the basis is cached, keyed on the contents of `light_dir`.
+        """
+        if self.training:
+            return sh.dir2sh_torch(self.n_diff_sh, light_dir)
+
+        key = (
+            hashlib.blake2b(
+                light_dir.detach().cpu().numpy().tobytes(), digest_size=8
+            ).digest(),
+            tuple(light_dir.shape),
+            light_dir.device,
+        )
+        if key in self._sh_cache:
+            self._sh_cache.move_to_end(key)
+            return self._sh_cache[key]
 
-        rgbs: List[th.Tensor] = []
-        Ts: List[th.Tensor] = []
-        depths: List[th.Tensor] = []
+        sh_coeffs = sh.dir2sh_torch(self.n_diff_sh, light_dir)
+        self._sh_cache[key] = sh_coeffs
+        if len(self._sh_cache) > sh_cache_size:
+            self._sh_cache.popitem(last=False)
+        return sh_coeffs
 
-        for b in range(B):
-            render_output = render_gs(
+    def render(self, K: th.Tensor, Rt: th.Tensor, preds: Dict[str, Any]):
+        # NOTE: the rasterizer only supports fp32
+        with th.autocast(device_type=K.device.type, enabled=False):
+            render_output = render_gs_batched(
                 cam_img_w=self.width,
                 cam_img_h=self.height,
-                fx=K[b, 0, 0].item(),
-                fy=K[b, 1, 1].item(),
-                cx=K[b, 0, 2].item(),
-                cy=K[b, 1, 2].item(),
-                Rt=Rt[b],
-                primpos=preds["primpos"][b],
-                primqvec=preds["primqvec"][b],
-                primscale=preds["primscale"][b],
-                opacity=preds["opacity"][b],
-                colors=preds["color"][b],
+                fx=K[:, 0, 0].float(),
+                fy=K[:, 1, 1].float(),
+                cx=K[:, 0, 2].float(),
+                cy=K[:, 1, 2].float(),
+                Rt=Rt.float(),
+                primpos=preds["primpos"].float(),
+                primqvec=preds["primqvec"].float(),
+                primscale=preds["primscale"].float(),
+                opacity=preds["opacity"].float(),
+                colors=preds["color"].float(),
                 return_depth=True,
             )
 
-            rgbs.append(render_output["render"])
-            Ts.append(render_output["final_T"].detach())
-            depths.append(render_output["depth"])
-
-        rgb = th.stack(rgbs)
-        depth = th.stack(depths)
-
-        rgb = rgb
-        alpha = 1.0 - th.stack(Ts)
-        depth = depth / alpha.clamp(0.05, 1.0)
-
-        del rgbs
-        del Ts
-        del depths
+        rgb = render_output["render"]
+        alpha = render_output["alpha"].detach()
+        depth = render_output["depth"] / alpha.clamp(0.05, 1.0)
 
         return rgb, alpha, depth
 
@@ -174,25 +290,21 @@ class AutoEncoder(nn.Module):
 
         light_intensity = light_intensity.expand(-1, -1, 3)
 
-        # convert everything into head relative coordinates
-        head_pose_4x4 = th.cat([head_pose, th.zeros_like(head_pose[:, :1, :])], dim=1)
-        head_pose_4x4[:, 3, 3] = 1.0
-        headrel_Rt = Rt @ head_pose_4x4
-        headrel_campos = (
-            (campos - head_pose[:, :3, 3])[:, None] @ head_pose[:, :3, :3]
-        )[:, 0]
-        headrel_light_pos = (light_pos - head_pose[:, None, :3, 3]) @ head_pose[
-            :, :3, :3
-        ]
-        headrel_light_dir = F.normalize(headrel_light_pos, p=2, dim=-1)
-        sh_coeffs = sh.dir2sh_torch(self.n_diff_sh, headrel_light_dir)
-        headrel_light_sh = (sh_coeffs[:, :, None] * light_intensity[..., None]).sum(
-            dim=1
-        )
-        if lightrot is not None:
-            lightrot = lightrot @ head_pose[:, :3, :3]
+        # NOTE: poses and the SH basis are kept in fp32 when running under autocast
+        with th.autocast(device_type=head_pose.device.type, enabled=False):
+            # convert everything into head relative coordinates
+            (
+                headrel_Rt,
+                headrel_campos,
+                headrel_light_pos,
+                headrel_light_dir,
+            ) = to_head_relative(head_pose, Rt, campos, light_pos)
+            sh_coeffs = self.light_dir2sh(headrel_light_dir)
+            headrel_light_sh = th.einsum("bnc,bnk->bkc", sh_coeffs, light_intensity)
+            if lightrot is not None:
+                lightrot = lightrot @ head_pose[:, :3, :3]
         # encoding
-        enc_preds = self.encoder(registration_vertices, color)
+        enc_preds = self.encode(registration_vertices, color, frame_id)
         embs = enc_preds["embs"]
 
         # decoding
@@ -225,9 +337,10 @@ class AutoEncoder(nn.Module):
 
         if self.training:
             if background is not None:
-                bg = background[:, :3].clone()
-                bg[th.logical_not(is_fully_lit_frame)] *= 0.0
-                rgb = rgb + (1.0 - alpha) * bg
+                # NOTE: background is only composited for fully lit frames
+                lit = is_fully_lit_frame.to(background.dtype).view(B, 1, 1, 1)
+                bg = background[:, :3] * lit
+                rgb = rgb.addcmul(1.0 - alpha, bg)
 
         if preconv_envmap is not None and "envbg" in kwargs:
             rgb = compose_envmap(rgb, alpha, kwargs["envbg"], K, Rt)
@@ -369,6 +482,111 @@ class GeomDecoder(nn.Module):
         return preds
 
 
+def decode_prim_params(
+    f_vnocond: th.Tensor,
+    f_vcond: th.Tensor,
+    primposbase: th.Tensor,
+    primnmlbase: th.Tensor,
+    n_color_sh_coeffs: int,
+    n_mono_sh_coeffs: int,
+) -> Dict[str, th.Tensor]:
+    """Slices the decoder feature maps into per-Gaussian parameters.
+
+    NOTE: this is kept free of data-dependent control flow, so that, when compiled,
+    the pointwise chains get fused with the epilogues of the decoder convolutions.
+    """
+    B = f_vnocond.shape[0]
+    n_diff_coeffs = 3 * n_color_sh_coeffs + n_mono_sh_coeffs
+
+    # NOTE: under autocast, only the diffuse SH are kept in reduced precision
+    f_vcond = f_vcond.permute(0, 2, 3, 1).view(B, -1, 4).float()
+
+    # diffuse sh
+    diff_shs = f_vnocond[:, :n_diff_coeffs]
+    diff_shs = diff_shs.permute(0, 2, 3, 1).view(B, -1, n_diff_coeffs)
+    diff_shs_color = diff_shs[..., : n_color_sh_coeffs * 3].reshape(
+        B, -1, 3, n_color_sh_coeffs
+    )
+    diff_shs_mono = diff_shs[..., n_color_sh_coeffs * 3 :].reshape(
+        B, -1, n_mono_sh_coeffs
+    )
+
+    # Gaussian parameters
+    f_geom = f_vnocond[:, n_diff_coeffs : n_diff_coeffs + 11]
+    f_geom = f_geom.permute(0, 2, 3, 1).view(B, -1, 11).float()
+    primpos = f_geom[..., 0:3] + primposbase
+    primqvec = F.normalize(f_geom[..., 3:7], dim=-1)
+    primscale = F.softplus(f_geom[..., 7:10])
+    opacity = th.sigmoid(f_geom[..., 10:11])
+
+    # roughness
+    sigma = f_vnocond[:, n_diff_coeffs + 11 :]
+    sigma = sigma.permute(0, 2, 3, 1).view(B, -1).float()
+    sigma = (th.exp(sigma) * 0.1).clamp(min=0.01)
+
+    # view-dependent specular visibility
+    spec_vis = th.sigmoid(f_vcond[..., :1])
+
+    # view-dependent specular normal
+    spec_dnml = f_vcond[..., 1:]
+    spec_nml = F.normalize(spec_dnml + primnmlbase, dim=-1)
+
+    return dict(
+        diff_shs_color=diff_shs_color,
+        diff_shs_mono=diff_shs_mono,
+        primpos=primpos,
+        primqvec=primqvec,
+        primscale=primscale,
+        opacity=opacity,
+        sigma=sigma,
+        spec_vis=spec_vis,
+        spec_dnml=spec_dnml,
+        spec_nml=spec_nml,
+    )
+
+
+def diff_sh_dot(
+    diff_shs_color: th.Tensor, diff_shs_mono: th.Tensor, light_sh: th.Tensor
+) -> th.Tensor:
+    """Integrates the diffuse SH against the light SH `[B, 3, n_coeffs]`.
+
+    The lower bands `diff_shs_color` `[B, N, 3, n_color]` are per channel, while
+    the higher bands `diff_shs_mono` `[B, N, n_mono]` are shared by all channels,
+    and are contracted with a single matmul instead of being replicated 3x.
+    """
+    n_color = diff_shs_color.shape[-1]
+    diff_color = (diff_shs_color * light_sh[:, None, :, :n_color]).sum(dim=-1)
+    # NOTE: the matmul is kept in fp32 when running under autocast
+    with th.autocast(device_type=light_sh.device.type, enabled=False):
+        diff_mono = th.matmul(
+            diff_shs_mono.to(light_sh.dtype), light_sh[..., n_color:].transpose(1, 2)
+        )
+    return diff_color + diff_mono
+
+
+@th.jit.script
+def reflect_view_dirs(
+    primpos: th.Tensor, campos: th.Tensor, nml: th.Tensor
+) -> th.Tensor:
+    """Reflects view directions `campos` `[B, 3]` -> `primpos` `[B, N, 3]` about `nml`.
+
+    NOTE: scripted, s.t. the pointwise chain is fused into a single kernel.
+    """
+    view = primpos - campos.unsqueeze(1)
+    view = view / view.norm(p=2.0, dim=-1, keepdim=True).clamp(min=1e-12)
+    return view - 2.0 * (view * nml).sum(-1, keepdim=True) * nml
+
+
+@th.jit.script
+def shade_colors(
+    albedo: th.Tensor, diff_sh: th.Tensor, spec_color: th.Tensor
+) -> Tuple[th.Tensor, th.Tensor]:
+    """Returns the diffuse and the final (clamped) colors in a single fused pass."""
+    diff_color = albedo.to(diff_sh.dtype) * diff_sh
+    color = (diff_color.clamp(min=0.0) + spec_color).clamp(min=0.0)
+    return diff_color, color
+
+
 class PrimDecoder(nn.Module):
     """A decoder for relightable Gaussians."""
 
@@ -459,6 +677,11 @@ class PrimDecoder(nn.Module):
         la.glorot(self.vnocond_mod[-1], 1.0)
         la.glorot(self.vcond_mod[-1], 1.0)
 
+        # NOTE: NHWC lets cuDNN use tensor-core kernels for the 1024x1024 outputs,
+        # and makes the per-Gaussian (B, H*W, C) views of the outputs copy-free
+        self.vnocond_mod.to(memory_format=th.channels_last)
+        self.vcond_mod.to(memory_format=th.channels_last)
+
         rgb = color_mean / 255.0  # [3, tex_res, tex_res]
         albedo = (2.0 * rgb / 2.2974).permute(1, 2, 0).reshape(1, -1, 3)
         self.albedo = th.nn.Parameter(albedo)
@@ -478,72 +701,50 @@ class PrimDecoder(nn.Module):
         preds = {}
         B = embs.shape[0]
 
-        # compute positional map on uv
-        # TODO: check if we need this
-        postex = self.geo_fn.to_uv(geom)
-        primposbase = postex.permute(0, 2, 3, 1).view(B, -1, 3)
-
-        # compute normal map on uv
+        # compute positional and normal maps on uv with a single lookup
         # TODO: check if we need this
         vn = self.geo_fn.vn(geom)
-        tn = self.geo_fn.to_uv(vn)
+        postex, tn = self.geo_fn.to_uv(th.cat([geom, vn], dim=-1)).split(3, dim=1)
+        primposbase = postex.permute(0, 2, 3, 1).reshape(B, -1, 3)
         tn = F.normalize(tn, dim=1)
         primnmlbase = tn.permute(0, 2, 3, 1).reshape(B, -1, 3)
 
         # run view-independent decoder
         embs = self.encmod(embs).view(-1, 256, 8, 8)
+        embs = embs.contiguous(memory_format=th.channels_last)
         f_vnocond = self.vnocond_mod(embs)
 
         # run view-dependent decoder
         view = self.viewmod(F.normalize(headrel_campos, dim=1))[
             :, :, None, None
         ].expand(-1, -1, 8, 8)
-        embs_v = th.cat([embs, view], dim=1)
+        embs_v = th.cat([embs, view], dim=1).contiguous(memory_format=th.channels_last)
         f_vcond = self.vcond_mod(embs_v)
-        f_vcond = f_vcond.permute(0, 2, 3, 1).view(B, -1, 4)
 
-        # diffuse sh
-        diff_shs = f_vnocond[:, : self.n_diff_coeffs]
-        diff_shs = diff_shs.permute(0, 2, 3, 1).view(B, -1, self.n_diff_coeffs)
-        diff_shs_color = diff_shs[..., : self.n_color_sh_coeffs * 3].reshape(
-            B, -1, 3, self.n_color_sh_coeffs
-        )
-        diff_shs_mono = diff_shs[..., self.n_color_sh_coeffs * 3 :].reshape(
-            B, -1, 1, self.n_mono_sh_coeffs
+        prim_params = decode_prim_params(
+            f_vnocond,
+            f_vcond,
+            primposbase,
+            primnmlbase,
+            self.n_color_sh_coeffs,
+            self.n_mono_sh_coeffs,
         )
-        diff_shs = th.cat([diff_shs_color, diff_shs_mono.expand(-1, -1, 3, -1)], -1)
-
-        # Gaussian parameters
-        f_geom = f_vnocond[:, self.n_diff_coeffs: self.n_diff_coeffs + 11]
-        f_geom = f_geom.permute(0, 2, 3, 1).view(B, -1, 11)
-        primpos = f_geom[..., 0:3] + primposbase
-        primqvec = F.normalize(f_geom[..., 3:7], dim=-1)
-        primscale = F.softplus(f_geom[..., 7:10])
-        opacity = th.sigmoid(f_geom[..., 10:11])
-
-        # roughness
-        sigma = f_vnocond[:, self.n_diff_coeffs + 11:]
-        sigma = sigma.permute(0, 2, 3, 1).view(B, -1)
-        sigma = (th.exp(sigma) * 0.1).clamp(min=0.01)
-
-        # view-dependent specular visibility
-        spec_vis = th.sigmoid(f_vcond[..., :1])
-
-        # view-dependent specular normal
-        spec_dnml = f_vcond[..., 1:]
-        spec_nml = F.normalize(spec_dnml + primnmlbase, dim=-1)
-
-        # albedo
-        albedo = self.albedo.expand(B, -1, -1)
-
-        # compute diffuse color
-        diff_color = albedo * (diff_shs * headrel_light_sh[:, None]).sum(dim=-1)
+        diff_shs_color = prim_params["diff_shs_color"]
+        diff_shs_mono = prim_params["diff_shs_mono"]
+        primpos = prim_params["primpos"]
+        primqvec = prim_params["primqvec"]
+        primscale = prim_params["primscale"]
+        opacity = prim_params["opacity"]
+        sigma = prim_params["sigma"]
+        spec_vis = prim_params["spec_vis"]
+        spec_dnml = prim_params["spec_dnml"]
+        spec_nml = prim_params["spec_nml"]
+
+        # compute diffuse shading
+        diff_sh = diff_sh_dot(diff_shs_color, diff_shs_mono, headrel_light_sh)
 
         # compute specular color
-        view_local = F.normalize(primpos - headrel_campos[:, None], dim=-1, p=2.0)
-        ref_dirs = (
-            view_local - 2.0 * (view_local * spec_nml).sum(-1, keepdim=True) * spec_nml
-        )
+        ref_dirs = reflect_view_dirs(primpos, headrel_campos, spec_nml)
 
         if preconv_envmap is not None:
             # rotate ref vector not envmap itself
@@ -569,10 +770,11 @@ class PrimDecoder(nn.Module):
                 * spec_vis
             )
 
-        color = diff_color.clamp(min=0.0) + spec_color
+        # NOTE: albedo `[1, N, 3]` is broadcast over the batch
+        diff_color, color = shade_colors(self.albedo, diff_sh, spec_color)
 
         preds.update(
-            color=color.clamp(min=0.0),
+            color=color,
             opacity=opacity,
             primpos=primpos,
             primqvec=primqvec,
@@ -612,7 +814,7 @@ class PrimDecoder(nn.Module):
                     dim=1
                 )
 
-            diff_color_rand = (diff_shs * light_sh[:, None]).sum(dim=-1)
+            diff_color_rand = diff_sh_dot(diff_shs_color, diff_shs_mono, light_sh)
 
             preds["cos_weight"] = cos_weight
             preds["color_rand"] = diff_color_rand.clamp(min=0.0)
@@ -620,9 +822,30 @@ class PrimDecoder(nn.Module):
         return preds
 
 
-class RGCASummary(Callable):
+class RGCASummary(nn.Module):
+    def __init__(self, sh_degree: int = 8):
+        super().__init__()
+
+        # normals of the front and back hemispheres used to visualize the light SH
+        h, w = 128, 128
+        py, px = th.meshgrid(
+            th.linspace(1.0, -1.0, h), th.linspace(-1.0, 1.0, w), indexing="ij"
+        )
+        pixelcoords = th.stack([px, py], -1)
+        zsq = pixelcoords.pow(2).sum(-1, keepdim=True)
+        mask = (zsq < 1.0).float()[:, :, 0]
+        nz = -(1.0 - zsq).clamp(min=0.0).sqrt()
+        nml_n = th.cat([pixelcoords, nz], -1)
+        nml_p = th.cat([pixelcoords, -nz], -1)
+        nml = th.cat([nml_p, nml_n], 0)
+        mask = th.cat([mask, mask], 0)
+
+        self.register_buffer("sphere_mask", mask, persistent=False)
+        self.register_buffer(
+            "sphere_sh", sh.dir2sh_torch(sh_degree, nml), persistent=False
+        )
 
-    def __call__(
+    def forward(
         self, preds: Dict[str, Any], batch: Dict[str, Any]
     ) -> Dict[str, th.Tensor]:
 
@@ -640,51 +863,27 @@ class RGCASummary(Callable):
 
         fh, fw = 1024, 1024
         nf = fh * fw
-        h = fh
 
-        out = th.zeros(bs, 3, h, fw, device=dev)
-        out[:, :, :fh] = color[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["sh_slab"] = linear2srgb(out).clamp(0, 1)
+        def _slab(x: th.Tensor) -> th.Tensor:
+            return x[:, :nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
 
-        out = th.zeros(bs, 3, h, fw, device=dev)
-        out[:, :, :fh] = diff_color[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["diff_sh_slab"] = linear2srgb(out).clamp(0, 1)
-
-        out = th.zeros(bs, 3, h, fw, device=dev)
-        out[:, :, :fh] = spec_color[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["spec_slab"] = linear2srgb(out).clamp(0, 1)
-
-        out = th.zeros(bs, 3, h, fw, device=dev)
-        out[:, :, :fh] = spec_normal[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["spec_normal_slab"] = out.clamp(0, 1)
-
-        out = th.zeros(bs, 1, h, fw, device=dev)
-        out[:, :, :fh] = spec_vis[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["spec_vis_slab"] = out.clamp(0, 1)
-
-        out = th.zeros(bs, 1, h, fw, device=dev)
-        out[:, :, :fh] = spec_rough[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["spec_rough_slab"] = out.clamp(0, 1)
+        srgb_slabs = linear2srgb(
+            th.cat([_slab(color), _slab(diff_color), _slab(spec_color)], dim=0)
+        ).clamp(0, 1)
+        diag["sh_slab"], diag["diff_sh_slab"], diag["spec_slab"] = srgb_slabs.split(
+            bs
+        )
+        diag["spec_normal_slab"] = _slab(spec_normal).clamp(0, 1)
+        diag["spec_vis_slab"] = _slab(spec_vis).clamp(0, 1)
+        diag["spec_rough_slab"] = _slab(spec_rough).clamp(0, 1)
+        diag["opacity_slab"] = _slab(opacity).clamp(0, 1)
 
-        out = th.zeros(bs, 1, h, fw, device=dev)
-        out[:, :, :fh] = opacity[:, 0:nf].view(bs, fh, fw, -1).permute(0, 3, 1, 2)
-        diag["opacity_slab"] = out.clamp(0, 1)
+        if self.sphere_sh.device != dev:
+            self.to(dev)
 
         light_sh = preds["headrel_light_sh"]
-        h, w = 128, 128
-        py, px = th.meshgrid(
-            th.linspace(1.0, -1.0, h, device=dev), th.linspace(-1.0, 1.0, w, device=dev)
-        )
-        pixelcoords = th.stack([px, py], -1)
-        zsq = pixelcoords.pow(2).sum(-1, keepdim=True)
-        mask = (zsq < 1.0).float()[:, :, :1]
-        nz = -(1.0 - zsq).clamp(min=0.0).sqrt()
-        nml_n = th.cat([pixelcoords, nz], -1)
-        nml_p = th.cat([pixelcoords, -nz], -1)
-        nml = th.cat([nml_p, nml_n], 0)
-        mask = th.cat([mask, mask], 0)
-        color = sh.eval_sh(8, light_sh[:, None, None], nml)
-        color = (mask * color).permute(0, 3, 1, 2)
+        color = th.einsum("bkc,hwc->bkhw", light_sh, self.sphere_sh)
+        color = self.sphere_mask * color
         diag["light_sh"] = color / color.max()
 
         render = preds["rgb"]
@@ -716,11 +915,6 @@ class RGCASummary(Callable):
             + (1.0 - diag["alpha"]) * 0.5
         )
 
-        bdi = make_image_grid_batched(diag, input_is_in_0_1=True)
-        bdi = cv2.resize(
-            bdi, fx=0.5, fy=0.5, dsize=None, interpolation=cv2.INTER_LINEAR
-        )
-
         for k, v in diag.items():
             diag[k] = make_grid(255.0 * v, nrow=16).clip(0, 255).to(th.uint8)
 
@@ -4,7 +4,7 @@
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Optional
+from typing import Dict, Optional, Union
 
 import torch as th
 from gsplat import project_gaussians
@@ -13,10 +13,10 @@ from gsplat import rasterize_gaussians
 def render(
     cam_img_w: int,
     cam_img_h: int,
-    fx: float,
-    fy: float,
-    cx: float,
-    cy: float,
+    fx: Union[float, th.Tensor],
+    fy: Union[float, th.Tensor],
+    cx: Union[float, th.Tensor],
+    cy: Union[float, th.Tensor],
     Rt: th.Tensor,
     primpos: th.Tensor,
     primqvec: th.Tensor,
@@ -29,6 +29,11 @@ def render(
     global_scale: float = 1.0,
     z_near: float = 0.1,
 ):
+    # NOTE: the rasterizer takes intrinsics as host scalars
+    fx, fy, cx, cy = (
+        v.item() if isinstance(v, th.Tensor) else v for v in (fx, fy, cx, cy)
+    )
+
     means3D = primpos.view(-1, 3).contiguous()
     scales = primscale.view(-1, 3).contiguous()
     rotations = primqvec.view(-1, 4).contiguous()
@@ -106,3 +111,65 @@ def render(
         out["depth"] = depth[None]
 
     return out
+
+
+def render_batched(
+    cam_img_w: int,
+    cam_img_h: int,
+    fx: th.Tensor,
+    fy: th.Tensor,
+    cx: th.Tensor,
+    cy: th.Tensor,
+    Rt: th.Tensor,
+    primpos: th.Tensor,
+    primqvec: th.Tensor,
+    primscale: th.Tensor,
+    opacity: th.Tensor,
+    colors: th.Tensor,
+    return_depth: bool = True,
+    **kwargs,
+) -> Dict[str, th.Tensor]:
+    """Batched version of `render`.
+
+    Intrinsics are passed as `[B]` tensors, all the other inputs have a leading batch
+    dim. The rasterizer takes intrinsics as host scalars, so they are fetched with a
+    single transfer, and the samples are rendered one after the other into
+    preallocated `[B, C, H, W]` outputs.
+
+    Returns `render`, `alpha` and (optionally) `depth`.
+    """
+    B = Rt.shape[0]
+    device = Rt.device
+
+    intrinsics = th.stack([fx, fy, cx, cy], dim=-1).tolist()
+
+    out = {
+        "render": th.empty(B, 3, cam_img_h, cam_img_w, device=device),
+        "alpha": th.empty(B, 1, cam_img_h, cam_img_w, device=device),
+    }
+    if return_depth:
+        out["depth"] = th.empty(B, 1, cam_img_h, cam_img_w, device=device)
+
+    # NOTE: gsplat launches its kernels on the legacy default stream, rendering on
+    # side streams would race with the torch ops around them
+    for b in range(B):
+        render_output = render(
+            cam_img_w=cam_img_w,
+            cam_img_h=cam_img_h,
+            fx=intrinsics[b][0],
+            fy=intrinsics[b][1],
+            cx=intrinsics[b][2],
+            cy=intrinsics[b][3],
+            Rt=Rt[b],
+            primpos=primpos[b],
+            primqvec=primqvec[b],
+            primscale=primscale[b],
+            opacity=opacity[b],
+            colors=colors[b],
+            return_depth=return_depth,
+            **kwargs,
+        )
+        for k in out:
+            out[k][b] = render_output[k]
+
+    return out
@@ -115,11 +115,46 @@ def dir2sh(dir: th.Tensor, deg: int) -> th.Tensor:
     
     return th.as_tensor(np.stack(shs, -1))
 
+# normalization constants of the closed-form SH bands L0-L2
+SH_C0: float = KVal(0, 0)
+SH_C1: float = math.sqrt(2.0) * KVal(1, 1)
+SH_C2: float = 3.0 * math.sqrt(2.0) * KVal(1, 2)
+SH_C2_0: float = 0.5 * KVal(0, 2)
+SH_C2_2: float = 3.0 * math.sqrt(2.0) * KVal(2, 2)
+
+
+def dir2sh9_fast(dirs: th.Tensor) -> th.Tensor:
+    """Closed-form SH basis of bands L0-L2, matches `dir2sh_torch(2, dirs)`.
+
+    NOTE: `dirs` are assumed to be normalized.
+    """
+    x, y, z = dirs.unbind(dim=-1)
+    return th.stack(
+        [
+            th.full_like(x, SH_C0),
+            -SH_C1 * y,
+            SH_C1 * z,
+            -SH_C1 * x,
+            SH_C2 * x * y,
+            -SH_C2 * y * z,
+            SH_C2_0 * (3.0 * z * z - 1.0),
+            -SH_C2 * x * z,
+            SH_C2_2 * (x * x - y * y),
+        ],
+        dim=-1,
+    )
+
+
 def dir2sh_torch(deg: int, dirs: th.Tensor) -> th.Tensor:
+    # bands L0-L2 have a cheap closed form, assuming normalized `dirs`
+    shs = dir2sh9_fast(dirs)[..., : (min(deg, 2) + 1) ** 2]
+    if deg <= 2:
+        return shs
+
     theta, phi = dir2angle(dirs)
-    
-    shs = []
-    for n in range(0, deg+1):
+
+    shs = list(shs.unbind(dim=-1))
+    for n in range(3, deg+1):
         for m in range(-n,n+1):
             s = SphericalHarmonicTorch(m, n, theta, phi)
             shs.append(s)
@@ -127,17 +162,19 @@ def dir2sh_torch(deg: int, dirs: th.Tensor) -> th.Tensor:
     return th.stack(shs, dim=-1)
     
 def eval_sh(deg: int, sh: th.Tensor, dirs: th.Tensor) -> th.Tensor:
+    # bands L0-L2 have a cheap closed form, assuming normalized `dirs`
+    n_fast = (min(deg, 2) + 1) ** 2
+    val = (sh[..., :n_fast] * dir2sh9_fast(dirs)[..., None, :n_fast]).sum(dim=-1)
+    if deg <= 2:
+        return val
+
     theta, phi = dir2angle(dirs)
-    
-    val = None    
-    index = 0
-    for n in range(0, deg+1):
+
+    index = n_fast
+    for n in range(3, deg+1):
         for m in range(-n,n+1):
             s = SphericalHarmonicTorch(m, n, theta, phi)
-            if val is None:
-                val = sh[..., index] * s[..., None]
-            else:
-                val += sh[..., index] * s[..., None]
+            val += sh[..., index] * s[..., None]
             index += 1
     
     return val
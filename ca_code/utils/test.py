@@ -30,7 +30,7 @@ from ca_code.utils.train import (
     load_checkpoint,
 
 )
-from ca_code.utils.torchutils import to_device
+from ca_code.utils.torchutils import CUDAPrefetcher
 from ca_code.utils.module_loader import load_class, build_optimizer
 
 from torchvision.utils import make_grid, save_image
@@ -60,23 +60,31 @@ def test(
     summary_enabled: bool = True,
     iteration: int = 0,
     device: Optional[Union[th.device, str]] = "cuda:0",
+    autocast_dtype: Optional[th.dtype] = None,
 ) -> Dict[str, float]:
 
     loss_means = defaultdict(list)
 
-    for i, batch in enumerate(test_data):
+    # NOTE: the next batch is copied to the device while the current one is processed
+    for i, batch in enumerate(CUDAPrefetcher(test_data, device)):
 
         if batch is None:
             logger.info("skipping empty batch")
             continue
-        batch = to_device(batch, device)
         batch["iteration"] = iteration
                 
         if batch_filter_fn is not None:
             batch_filter_fn(batch)
 
         # leaving only inputs acutally used by the model
-        preds = model(**filter_inputs(batch, model, required_only=False))
+        # NOTE: the autocast weight cache does not work with CUDA graph capture
+        with th.autocast(
+            device_type=th.device(device).type,
+            dtype=autocast_dtype,
+            enabled=autocast_dtype is not None,
+            cache_enabled=False,
+        ):
+            preds = model(**filter_inputs(batch, model, required_only=False))
 
         # TODO: switch to the old-school loss computation
         loss, loss_dict = loss_fn(preds, batch, iteration=iteration)
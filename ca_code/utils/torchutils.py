@@ -3,7 +3,19 @@
 #
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
-from typing import Optional, Tuple, Sequence, TypeVar, Union, Mapping, Any, List, Dict
+from typing import (
+    Optional,
+    Tuple,
+    Sequence,
+    TypeVar,
+    Union,
+    Mapping,
+    Any,
+    List,
+    Dict,
+    Callable,
+    Iterator,
+)
 
 import torch as th
 import numpy as np
@@ -231,6 +243,126 @@ def to_device(
     else:
         return things
 
+
+CapturedGraph = Tuple[th.cuda.CUDAGraph, List[th.Tensor], Any]
+
+
+class CUDAGraphed:
+    """Wraps a function of tensors s.t. it is replayed from a captured CUDA graph.
+
+    A graph is captured for each distinct set of input shapes on its first call
+    (after `n_warmup` eager calls on a side stream), and replayed on later calls with
+    the same shapes. At most `max_graphs` graphs are kept, calls with other shapes
+    then run eagerly, s.t. variable shapes (e.g. batch sizes) do not keep triggering
+    captures. Calls with grad enabled or with non-CUDA inputs run eagerly as well.
+
+    NOTE: outputs are static buffers that get overwritten by the next call with the
+    same shapes, clone them if they need to outlive it.
+
+    Example:
+        module.forward = CUDAGraphed(module.forward)
+    """
+
+    def __init__(
+        self, fn: Callable[..., Any], n_warmup: int = 3, max_graphs: int = 8
+    ) -> None:
+        self.fn = fn
+        self.n_warmup = n_warmup
+        self.max_graphs = max_graphs
+        # shape key -> (graph, static inputs, static outputs)
+        self.graphs: Dict[Tuple[Any, ...], CapturedGraph] = {}
+
+    def capture(self, *args: th.Tensor) -> CapturedGraph:
+        static_inputs = [a.clone() for a in args]
+
+        stream = th.cuda.Stream()
+        stream.wait_stream(th.cuda.current_stream())
+        with th.cuda.stream(stream):
+            for _ in range(self.n_warmup):
+                self.fn(*static_inputs)
+        th.cuda.current_stream().wait_stream(stream)
+
+        graph = th.cuda.CUDAGraph()
+        with th.cuda.graph(graph):
+            static_outputs = self.fn(*static_inputs)
+        return graph, static_inputs, static_outputs
+
+    def __call__(self, *args: th.Tensor) -> Any:
+        if th.is_grad_enabled() or not all(
+            isinstance(a, th.Tensor) and a.is_cuda for a in args
+        ):
+            return self.fn(*args)
+
+        key = tuple((a.shape, a.dtype, a.device) for a in args)
+        if key not in self.graphs:
+            if len(self.graphs) >= self.max_graphs:
+                return self.fn(*args)
+            self.graphs[key] = self.capture(*args)
+
+        graph, static_inputs, static_outputs = self.graphs[key]
+        for static_input, a in zip(static_inputs, args):
+            static_input.copy_(a)
+        graph.replay()
+        return static_outputs
+
+
+def record_stream(things: Any, stream: th.cuda.Stream) -> None:
+    """Marks all the CUDA tensors in a nested container as used by `stream`, s.t.
+    the caching allocator does not reuse their memory while it is still in use."""
+    if isinstance(things, th.Tensor):
+        if things.is_cuda:
+            things.record_stream(stream)
+    elif isinstance(things, dict):
+        for v in things.values():
+            record_stream(v, stream)
+    elif isinstance(things, Sequence) and not isinstance(things, str):
+        for v in things:
+            record_stream(v, stream)
+
+
+class CUDAPrefetcher:
+    """Wraps an iterable of (nested containers of) tensors s.t. the next batch is
+    sent to the device on a side stream while the current one is being consumed.
+
+    Batches are best coming from a `DataLoader` with `pin_memory=True`, otherwise
+    the host-to-device copies are not asynchronous. `None` batches are passed
+    through, and on non-CUDA devices batches are transferred synchronously.
+
+    Example:
+        for batch in CUDAPrefetcher(loader, device):
+            preds = model(**batch)
+    """
+
+    def __init__(self, loader: Any, device: Union[th.device, str]) -> None:
+        self.loader = loader
+        self.device = th.device(device)
+        self.stream: Optional[th.cuda.Stream] = None
+        if self.device.type == "cuda":
+            self.stream = th.cuda.Stream(self.device)
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    def _load(self, batch: Any) -> Any:
+        if batch is None or self.stream is None:
+            return to_device(batch, self.device)
+        with th.cuda.stream(self.stream):
+            return to_device(batch, self.device, non_blocking=True)
+
+    def __iter__(self) -> Iterator[Any]:
+        it = iter(self.loader)
+        next_batch = self._load(next(it, None))
+        for _ in range(len(self)):
+            batch = next_batch
+            if self.stream is not None:
+                current_stream = th.cuda.current_stream(self.device)
+                current_stream.wait_stream(self.stream)
+                record_stream(batch, current_stream)
+            # NOTE: issuing the next copy before handing out the current batch
+            next_batch = self._load(next(it, None))
+            yield batch
+
+
 def index(x: th.Tensor, idxs: th.Tensor, dim: int) -> th.Tensor:
     """Index a tensor along a given dimension using an index tensor, replacing
     the shape along the given dimension with the shape of the index tensor.